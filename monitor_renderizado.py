@@ -1,13 +1,27 @@
 # -*- coding: utf-8 -*-
 # RadarEntradas — Detector de AGOTADO / DISPONIBLE con logs por ciclo
 
-import os, re, sys, time, traceback
+import asyncio, atexit, concurrent.futures, functools, html, json, logging, os, queue, re, signal, sys, time, threading
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from urllib.parse import urlparse
 
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ========= Logging =========
+# Los hilos solo encolan; un listener aparte escribe a stdout (sin flush por línea).
+
+_LOG_Q = queue.Queue()
+_LOG_LISTENER = QueueListener(_LOG_Q, logging.StreamHandler(sys.stdout))
+logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[QueueHandler(_LOG_Q)])
+_LOG_LISTENER.start()
+atexit.register(_LOG_LISTENER.stop)
+log = logging.getLogger("radar")
 
 # ========= Config =========
 
@@ -27,48 +41,144 @@ TZ_NAME     = _get_env_any("TIMEZONE", "America/Argentina/Buenos_Aires")
 QUIET_START = int(_get_env_any("QUIET_START", "1"))
 QUIET_END   = int(_get_env_any("QUIET_END", "9"))
 
+# Páginas abiertas en paralelo sobre el Chromium compartido
+CHECK_WORKERS = int(_get_env_any("CHECK_WORKERS", "4"))
+
+# Estado por URL persistido entre reinicios (montar un volumen para que sobreviva deploys)
+SNAPSHOT_PATH = _get_env_any("SNAPSHOT_PATH", "/tmp/snapshot.json")
+
 # Opcional: enviar resumen de disponibles en cada ciclo (por defecto OFF)
 NOTIFY_AVAILABLE_EVERY_LOOP = _get_env_any("NOTIFY_AVAILABLE_EVERY_LOOP", "0") == "1"
 
 SIGN = " — Roberto"
 
 if not BOT_TOKEN or not CHAT_ID:
-    print("⚠️ Faltan variables de entorno TELEGRAM_BOT_TOKEN o TELEGRAM_CHAT_ID.")
+    log.warning("⚠️ Faltan variables de entorno TELEGRAM_BOT_TOKEN o TELEGRAM_CHAT_ID.")
 if not URLS_RAW:
-    print("⚠️ Faltan URLs (URLS o MONITORED_URLS o URL).")
+    log.warning("⚠️ Faltan URLs (URLS o MONITORED_URLS o URL).")
 
 URLS = [u.strip() for u in URLS_RAW.split(",") if u.strip()]
 
+# Índice de los comandos (/status N, /debug N, /sectores N) → URL; la lista no cambia en runtime
+_URL_BY_IDX = dict(enumerate(URLS, 1))
+_MSG_OUT_OF_RANGE = f"Índice fuera de rango (1–{len(URLS)}).{SIGN}"
+
 # Timestamp del último ciclo (se muestra con /last)
 LAST_LOOP_AT = None
 
+# /refresh despierta al loop de monitoreo sin esperar el intervalo completo
+# (solo si el loop corre: con MODE=bot nadie espera el evento)
+_REFRESH = threading.Event()
+_MONITOR_RUNNING = False
+
+# Sesión HTTP compartida con la API de Telegram (keep-alive, sin handshake por llamada).
+# Los reintentos de urllib3 solo aplican a métodos idempotentes: sendMessage (POST) no se duplica.
+_TG_SESSION = requests.Session()
+_TG_SESSION.mount("https://api.telegram.org", HTTPAdapter(
+    pool_connections=2, pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.3),
+))
+_TG_SESSION.headers.update({"User-Agent": "ticket-monitor/1.0"})
+
+# ========= Regex precompiladas =========
+
+def _keywords_re(keywords) -> re.Pattern:
+    """Alternativa única (sin mayúsculas) para una lista de keywords; los espacios
+    internos aceptan cualquier blanco ("sold  out", nbsp de innerText)."""
+    alts = "|".join(re.escape(k).replace(r"\ ", r"\s+") for k in keywords)
+    return re.compile(alts or r"(?!)", re.I)
+
+_RE_DATE_FULL    = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+_RE_DATE_OPT     = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+_RE_CMD_STATUS   = re.compile(r"^/status\s+(\d+)\s*$")
+_RE_CMD_DEBUG    = re.compile(r"^/debug\s+(\d+)\s*$")
+_RE_CMD_SECTORES = re.compile(r"^/sectores\s+(\d+)\s*$")
+# Bloques del HTML que no son texto visible (head, scripts, plantillas, comentarios)
+_RE_NON_TEXT     = re.compile(r"<(head|script|style|template|noscript)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+_RE_TAG          = re.compile(r"<[^>]+>")
+_RE_HTML_TITLE   = re.compile(r"<title[^>]*>(.*?)</title>", re.S | re.I)
+# Si aparecen, la página se arma con JS y el HTML crudo no es confiable
+_RE_HYDRATION    = re.compile(r"__NEXT_DATA__|data-reactroot")
+# Textos que delatan formularios/selector de país: el "agotado" ahí no es del show
+_RE_NOISE        = re.compile(r"\+54|número de dni|masculino|femenino|argentina|brasil", re.I)
+# Contexto de retiro/canje alrededor de una fecha: esa fecha no es de función
+_RETIRO_KEYS = ("retiro", "retirá", "retirar", "retíralo", "canje", "pick up", "punto de retiro", "retirás")
+_RE_RETIRO       = _keywords_re(_RETIRO_KEYS)
+# Trackers por dominio: se aplica a la URL entera pero solo matchea en el host
+# (corre por cada request, así que sin urlparse)
+_RE_BLOCKED_HOST = re.compile(
+    r"^[a-z][a-z0-9+.-]*://(?:[^/?#@]*@)?(?:[^/?#:@]*\.)?"
+    r"(?:googletagmanager\.com|google-analytics\.com|doubleclick\.net|facebook\.(?:com|net)"
+    r"|googlesyndication\.com|googleadservices\.com"
+    r"|hotjar\.com|segment\.(?:com|io)|clarity\.ms)(?:[:/?#]|$)",
+    re.I,
+)
+
 # ========= Utilidades =========
 
+try:
+    _TZ = ZoneInfo(TZ_NAME)
+except Exception:
+    _TZ = None  # zona inválida: hora local del contenedor
+
 def now_local():
-    try:
-        return datetime.now(ZoneInfo(TZ_NAME))
-    except Exception:
-        return datetime.now()
+    return datetime.now(_TZ)
+
+# Horas de no molestar, resueltas una vez (la franja puede cruzar medianoche)
+if QUIET_START <= QUIET_END:
+    _QUIET_HOURS = frozenset(range(QUIET_START, QUIET_END))
+else:
+    _QUIET_HOURS = frozenset(range(QUIET_START, 24)) | frozenset(range(0, QUIET_END))
 
 def in_quiet_hours(dt: datetime) -> bool:
-    h = dt.hour
-    if QUIET_START == QUIET_END:
-        return False
-    if QUIET_START < QUIET_END:
-        return QUIET_START <= h < QUIET_END
-    return h >= QUIET_START or h < QUIET_END
+    return dt.hour in _QUIET_HOURS
+
+# Cola de salida: un solo hilo envía, respetando el límite de Telegram
+# (~1 msg/s por chat) y el retry_after de los 429.
+_TG_Q = queue.Queue()
+_TG_MIN_INTERVAL = 1.0
+_TG_WORKER = None
+_TG_WORKER_LOCK = threading.Lock()
+
+def _tg_post(text: str):
+    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+    data = {"chat_id": CHAT_ID, "text": text, "parse_mode": "Markdown"}
+    while True:
+        r = _TG_SESSION.post(url, json=data, timeout=15)
+        if r.status_code != 429:
+            return
+        try:
+            wait = float(r.json()["parameters"]["retry_after"])
+        except Exception:
+            wait = 5.0
+        log.info(f"[tg] 429, reintento en {wait:.0f}s")
+        time.sleep(wait)
+
+def _tg_worker():
+    while True:
+        text = _TG_Q.get()
+        try:
+            _tg_post(text)
+        except Exception as e:
+            log.warning(f"⚠️ Telegram error: {e}")
+        finally:
+            _TG_Q.task_done()
+        time.sleep(_TG_MIN_INTERVAL)
+
+def _ensure_tg_worker():
+    global _TG_WORKER
+    with _TG_WORKER_LOCK:
+        if _TG_WORKER is None:
+            _TG_WORKER = threading.Thread(target=_tg_worker, name="tg-send", daemon=True)
+            _TG_WORKER.start()
 
 def tg_send(text: str, force: bool = False):
-    """Manda mensaje a Telegram (respeta no molestar salvo force=True)."""
-    if in_quiet_hours(now_local()) and not force:
-        print(f"[quiet] {text[:90]}...", flush=True)
+    """Encola un mensaje a Telegram (respeta no molestar salvo force=True); no bloquea."""
+    if not force and in_quiet_hours(now_local()):
+        log.info(f"[quiet] {text[:90]}...")
         return
-    try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        data = {"chat_id": CHAT_ID, "text": text, "parse_mode": "Markdown"}
-        requests.post(url, json=data, timeout=15)
-    except Exception as e:
-        print(f"⚠️ Telegram error: {e}", file=sys.stderr, flush=True)
+    _ensure_tg_worker()
+    _TG_Q.put(text)
 
 def prettify_from_slug(url: str) -> str:
     try:
@@ -77,16 +187,236 @@ def prettify_from_slug(url: str) -> str:
     except Exception:
         return url
 
-def extract_title(page):
+# Nombre derivado del slug, calculado una vez por URL monitoreada
+_SLUG_CACHE = {u: prettify_from_slug(u) for u in URLS}
+
+def slug_title(url: str) -> str:
+    return _SLUG_CACHE.get(url) or prettify_from_slug(url)
+
+def _clean_title(raw: str | None):
+    # "Show | AllAccess" → "Show"
+    return (raw or "").partition("|")[0].strip() or None
+
+async def extract_title(page):
     try:
-        t = page.title() or ""
-        t = re.sub(r"\s*\|.*$", "", t).strip()
-        return t if t else None
+        return _clean_title(await page.title())
     except Exception:
         return None
 
+# Títulos por URL (casi nunca cambian): los llena check_url y los usa /shows
+TITLE_TTL = 24 * 3600
+_TITLE_CACHE: dict[str, tuple[float, str]] = {}
+
+def _remember_title(url: str, title: str | None):
+    if title:
+        _TITLE_CACHE[url] = (time.monotonic(), title)
+
+def _cached_title(url: str):
+    entry = _TITLE_CACHE.get(url)
+    if entry and time.monotonic() - entry[0] < TITLE_TTL:
+        return entry[1]
+    return None
+
+# ========= Navegador compartido =========
+# Un único Chromium vive en un hilo propio con su event loop (API async de
+# Playwright). Monitor y bot le pasan corutinas; las páginas corren en paralelo
+# sobre el mismo contexto, acotadas por CHECK_WORKERS (y nunca más que URLs).
+
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+_PW = _BROWSER = _CTX = None
+_CTX_LOCK = asyncio.Lock()
+_PAGE_SLOT_COUNT = max(1, min(CHECK_WORKERS, len(URLS) or 1))
+_PAGE_SLOTS = asyncio.Semaphore(_PAGE_SLOT_COUNT)
+_IDLE_PAGES = []  # (page, usos): páginas ya abiertas para el próximo chequeo (a lo sumo una por slot)
+# Tras tantos chequeos la página se cierra y se abre otra: Playwright retiene
+# objetos Request/Response mientras la página vive
+PAGE_MAX_USES = 50
+
+# Recursos que nunca inspeccionamos: se abortan antes de descargarlos. El CSS
+# se deja pasar: la detección depende de la visibilidad (display:none, etc.)
+_BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "ping", "texttrack", "manifest"}
+
+async def _route_filter(route):
+    req = route.request
+    try:
+        rtype = req.resource_type
+        if rtype in _BLOCKED_RESOURCE_TYPES or _RE_BLOCKED_HOST.match(req.url):
+            return await route.abort()
+    except Exception:
+        pass
+    return await route.continue_()
+
+def _browser_loop():
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="browser", daemon=True).start()
+        return _LOOP
+
+def submit(coro):
+    """Programa una corutina en el hilo del navegador; devuelve un Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _browser_loop())
+
+def run_in_browser(coro):
+    """Ejecuta una corutina en el hilo del navegador y espera el resultado."""
+    return submit(coro).result()
+
+async def _close_browser():
+    global _BROWSER, _CTX
+    _IDLE_PAGES.clear()
+    for obj in (_CTX, _BROWSER):
+        if obj is not None:
+            try:
+                await obj.close()
+            except Exception:
+                pass
+    _BROWSER = _CTX = None
+
+async def _shutdown_browser():
+    global _PW
+    await _close_browser()
+    if _PW is not None:
+        try:
+            await _PW.stop()
+        except Exception:
+            pass
+        _PW = None
+
+def shutdown_browser():
+    """Cierra contexto, Chromium y driver de Playwright (solo si llegaron a abrirse)."""
+    if _LOOP is None:
+        return
+    try:
+        submit(_shutdown_browser()).result(timeout=10)
+    except Exception:
+        pass
+
+atexit.register(shutdown_browser)
+
+async def _get_context():
+    """Devuelve el BrowserContext compartido; relanza Chromium si se cayó."""
+    global _PW, _BROWSER, _CTX
+    async with _CTX_LOCK:
+        if _BROWSER is not None and not _BROWSER.is_connected():
+            log.info("[browser] desconectado, relanzando…")
+            await _close_browser()
+        if _BROWSER is None:
+            if _PW is None:
+                _PW = await async_playwright().start()
+            _BROWSER = await _PW.chromium.launch(
+                headless=True, args=["--disable-dev-shm-usage", "--no-sandbox"]
+            )
+        if _CTX is None:
+            _CTX = await _BROWSER.new_context(java_script_enabled=True)
+            await _CTX.route("**/*", _route_filter)
+        return _CTX
+
+# El contexto con route() acumula estado mientras vive: cada tantos ciclos del
+# monitor se descarta (Chromium sigue) y el próximo chequeo abre uno limpio
+CTX_RECYCLE_EVERY = 50
+
+async def _recycle_context():
+    """Cierra el contexto compartido y sus páginas cuando no hay chequeos en curso."""
+    global _CTX
+    # tomar todos los slots: espera a los chequeos en vuelo y frena los nuevos
+    for _ in range(_PAGE_SLOT_COUNT):
+        await _PAGE_SLOTS.acquire()
+    try:
+        async with _CTX_LOCK:
+            _IDLE_PAGES.clear()
+            if _CTX is not None:
+                try:
+                    await _CTX.close()
+                except Exception:
+                    pass
+                _CTX = None
+    finally:
+        for _ in range(_PAGE_SLOT_COUNT):
+            _PAGE_SLOTS.release()
+
+async def _warm_up():
+    """Lanza Chromium y deja abierta una página por slot, lista para el primer ciclo."""
+    ctx = await _get_context()
+    n = max(0, _PAGE_SLOT_COUNT - len(_IDLE_PAGES))
+    pages = await asyncio.gather(*[ctx.new_page() for _ in range(n)])
+    # no toma slots: los chequeos que arrancaron mientras tanto pudieron devolver
+    # sus propias páginas, así que el pool se completa solo hasta el tope
+    for p in pages:
+        if len(_IDLE_PAGES) < _PAGE_SLOT_COUNT:
+            _IDLE_PAGES.append((p, 0))
+        else:
+            await p.close()
+
+@asynccontextmanager
+async def new_page(host: str | None = None):
+    """
+    Página sobre el contexto compartido. Al salir vuelve al pool para el próximo
+    chequeo (goto pisa el estado anterior); si el chequeo falló o la página ya
+    cumplió PAGE_MAX_USES, se cierra. Con `host` se prefiere una página que ya
+    esté en ese host: la navegación same-site reusa el proceso del renderer.
+    """
+    async with _PAGE_SLOTS:
+        ctx = await _get_context()
+        page, uses = None, 0
+        # las cerradas o de un contexto ya reciclado se descartan
+        _IDLE_PAGES[:] = [(p, n) for p, n in _IDLE_PAGES if not p.is_closed() and p.context is ctx]
+        if _IDLE_PAGES:
+            i = next((i for i, (p, _) in enumerate(_IDLE_PAGES) if host and _host(p.url) == host), -1)
+            page, uses = _IDLE_PAGES.pop(i)
+        if page is None:
+            page = await ctx.new_page()
+        ok = False
+        try:
+            yield page
+            ok = True
+        finally:
+            if (ok and uses + 1 < PAGE_MAX_USES and not page.is_closed()
+                    and len(_IDLE_PAGES) < _PAGE_SLOT_COUNT):
+                _IDLE_PAGES.append((page, uses + 1))
+            else:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+
+# ========= Chequeos en paralelo =========
+
+async def _check_in_page(url: str, static: bool = True):
+    # primero el GET plano (en un hilo aparte para no frenar el event loop);
+    # Chromium solo si el HTML del servidor no alcanza para decidir
+    if not static:
+        async with new_page(_host(url)) as page:
+            return await check_url(url, page)
+    loop = asyncio.get_running_loop()
+    # GET condicional: si el HTML del último SOLDOUT estático no cambió (y no es
+    # muy viejo) se reusa tal cual. Copia propia: chequeos de la misma URL
+    # (/status durante un ciclo) pueden solaparse
+    prev = _LAST_RESULT.get(url)
+    fresh = prev is not None and time.monotonic() - prev[0] <= UNCHANGED_MAX_AGE
+    validators = dict(_VALIDATORS.get(url, {})) if fresh else {}
+    title, hint = await loop.run_in_executor(_HTTP_POOL, _static_check, url, _profile_for(url), validators)
+    _VALIDATORS[url] = validators
+    if hint == "UNCHANGED" and prev is not None:
+        return prev[1]
+    if hint == "SOLDOUT":
+        _remember_title(url, title)
+        result = [], title or slug_title(url), hint
+        _LAST_RESULT[url] = (time.monotonic(), result)
+        return result
+    # lo que decide Chromium depende de JS/APIs/dropdown, no del HTML: no se reusa por 304
+    _LAST_RESULT.pop(url, None)
+    async with new_page(_host(url)) as page:
+        return await check_url(url, page)
+
+def check_many(urls):
+    """Lanza check_url en paralelo; devuelve [(url, future)] en el orden de entrada."""
+    return [(url, submit(_check_in_page(url))) for url in urls]
+
 # ========= Perfiles por dominio (AllAccess + Deportick) =========
 
+@functools.lru_cache(maxsize=max(256, 2 * len(URLS)))
 def _host(url: str) -> str:
     try:
         return urlparse(url).netloc.lower()
@@ -108,6 +438,7 @@ VENDOR_PROFILES = {
             "button:has-text('Continuar')", "a:has-text('Continuar')",
         ],
         "disable_global_date_fallback": False,
+        "static_precheck": True,  # el badge AGOTADO viene en el HTML del servidor
     },
     # Deportick (texto AGOTADO al pie, evitar fallback global de fechas)
     "deportick.com": {
@@ -120,17 +451,46 @@ VENDOR_PROFILES = {
         ],
         "disable_global_date_fallback": True,
     },
-    "www.deportick.com": {
-        "soldout_keywords": ["agotado", "agotadas"],
-        "soldout_selectors": ["text=/agotad/i", ".agotado", ".agotadas"],
-        "buy_keywords": ["comprar", "comprar entradas", "quiero mis entradas"],
-        "buy_selectors": [
-            "button:has-text('Comprar')", "a:has-text('Comprar')",
-            "button:has-text('Comprar entradas')", "a:has-text('Comprar entradas')",
-        ],
-        "disable_global_date_fallback": True,
-    },
 }
+# Alias de host: comparten el mismo dict (y lo precalculado abajo)
+VENDOR_PROFILES["www.deportick.com"] = VENDOR_PROFILES["deportick.com"]
+
+def _css_only(selectors):
+    # "text=..." es sintaxis propia de Playwright, no se puede unir con comas
+    return [s for s in selectors if not s.startswith("text=")]
+
+def _is_native_css(sel: str) -> bool:
+    # lo que entiende document.querySelectorAll (sin extensiones de Playwright)
+    return not sel.startswith("text=") and ":has-text(" not in sel
+
+def _split_selectors(selectors):
+    """(CSS nativo unido con comas, grupos que solo entiende Playwright ya filtrados por visibles)."""
+    css = ", ".join(s for s in selectors if _is_native_css(s))
+    engine = [s for s in selectors if not _is_native_css(s)]
+    # los ':has-text()' se pueden unir en un solo locator; los 'text=' no
+    joined = ", ".join(_css_only(engine))
+    groups = ([joined] if joined else []) + [s for s in engine if s.startswith("text=")]
+    return css, [f"{g} >> visible=true" for g in groups]
+
+# Selectores precombinados por perfil: el CSS nativo se evalúa dentro del
+# escaneo JS; el resto va por locator solo si el escaneo no alcanzó. Los
+# ':has-text()' se quedan aunque el escaneo busque el mismo texto: Playwright
+# entra en shadow DOM y querySelectorAll no.
+for _prof in {id(p): p for p in VENDOR_PROFILES.values()}.values():
+    _prof["_soldout_re"] = _keywords_re(_prof.get("soldout_keywords", []))
+    _prof["_buy_re"] = _keywords_re(_prof.get("buy_keywords", []))
+    _prof["buy_css"], _prof["buy_engine"] = _split_selectors(_prof.get("buy_selectors", []))
+    _prof["soldout_css"], _prof["soldout_engine"] = _split_selectors(_prof.get("soldout_selectors", []))
+
+@functools.lru_cache(maxsize=max(64, 2 * len(URLS)))
+def _profile_for(url: str) -> dict:
+    """Perfil del vendor para la URL (AllAccess como default). URL → perfil no cambia."""
+    return VENDOR_PROFILES.get(_host(url)) or VENDOR_PROFILES["www.allaccess.com.ar"]
+
+# Las URLs monitoreadas son fijas: se resuelven una vez al importar y el loop
+# nunca vuelve a pasar por urlparse para ellas
+for _u in URLS:
+    _profile_for(_u)
 
 # ========= Helpers de UI (fechas) =========
 
@@ -143,132 +503,362 @@ FUNC_TRIGGERS = [
     ".event-functions",
 ]
 
-def _open_dropdown_if_any(page):
-    for trig in FUNC_TRIGGERS:
-        try:
-            loc = page.locator(trig).first
-            if loc and loc.count() > 0 and loc.is_visible():
-                loc.click(timeout=1500, force=True)
-                page.wait_for_timeout(250)
-        except Exception:
-            continue
+FUNC_TRIGGERS_JOINED = ", ".join(FUNC_TRIGGERS)
 
-def _find_functions_region(page):
-    for sel in ["select", "[role='listbox']", ".aa-event-dates", ".event-functions"]:
-        try:
-            r = page.locator(sel).first
-            if r and r.count() > 0 and r.is_visible():
-                return r
-        except Exception:
-            continue
-    return page  # fallback
+# Lo que aparece cuando el selector de funciones se despliega
+FUNC_POPOVER = ".MuiPopover-root, .MuiMenu-paper, [role='listbox']"
+
+# Bloques donde suelen listarse las funciones (el primero visible gana)
+FUNC_REGIONS = ["select", "[role='listbox']", ".aa-event-dates", ".event-functions"]
 
-def _gather_dates_in_region(region):
-    """Devuelve lista de fechas DD/MM/AAAA si aparecen en el bloque; si no, []."""
-    dates = set()
+async def _open_dropdown(page, hit: int):
+    """Abre el trigger de funciones FUNC_TRIGGERS[hit] y espera a que se despliegue."""
     try:
-        txt = ""
-        try:
-            txt = region.inner_text(timeout=500) or ""
-        except Exception:
-            txt = ""
-        for m in re.findall(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b", txt):
-            dd, mm, yy = m
-            dates.add(f"{int(dd):02d}/{int(mm):02d}/{yy}")
+        await page.locator(FUNC_TRIGGERS[hit]).first.click(timeout=1500, force=True)
+    except Exception:
+        return
+    # si no aparece popover, el dropdown no hacía falta
+    try:
+        await page.wait_for_selector(FUNC_POPOVER, timeout=800)
     except Exception:
         pass
-    return sorted(dates)
 
-# --- Filtro de fechas globales (evita “retiro/canje/pick up”) ---
+# Tope de fechas por página: más que esto es ruido y no vale recorrer el resto
+MAX_DATES = 32
 
-_RETIRO_KEYS = ("retiro", "retirá", "retirar", "retíralo", "canje", "pick up", "punto de retiro", "retirás")
+def _gather_dates_in_region(region_text: str):
+    """Devuelve lista de fechas DD/MM/AAAA (en orden cronológico) si aparecen en el bloque; si no, []."""
+    dates = {}  # (aaaa, mm, dd) -> 'dd/mm/aaaa'
+    for m in _RE_DATE_FULL.finditer(region_text or ""):
+        dd, mm, yy = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        dates[(yy, mm, dd)] = f"{dd:02d}/{mm:02d}/{yy}"
+        if len(dates) >= MAX_DATES:
+            break
+    return [dates[k] for k in sorted(dates)]
+
+# --- Filtro de fechas globales (evita “retiro/canje/pick up”, ver _RE_RETIRO) ---
 
 def _dates_from_text_filtered(body_text: str):
     """
     Extrae fechas evitando falsos positivos de secciones de retiro/canje.
     Se filtra por ventana de contexto +/- 80 caracteres alrededor del match.
     """
-    dates = set()
+    dates = {}  # (aaaa, mm, dd) -> texto; sin año ordena primero
     text = body_text or ""
-    for m in re.finditer(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b", text):
+    for m in _RE_DATE_OPT.finditer(text):
         dd = int(m.group(1)); mm = int(m.group(2))
         yy = m.group(3)
-        # Ventana de contexto
+        # Ventana de contexto (search acotado: sin cortar ni pasar a minúsculas)
         i0 = max(0, m.start() - 80)
         i1 = min(len(text), m.end() + 80)
-        ctx = text[i0:i1].lower()
-        if any(k in ctx for k in _RETIRO_KEYS):
+        if _RE_RETIRO.search(text, i0, i1):
             continue
         if yy:
-            dates.add(f"{dd:02d}/{mm:02d}/{yy if len(yy)==4 else ('20'+yy)}")
+            yyyy = int(yy if len(yy) == 4 else "20" + yy)
+            dates[(yyyy, mm, dd)] = f"{dd:02d}/{mm:02d}/{yyyy}"
         else:
-            dates.add(f"{dd:02d}/{mm:02d}")
-    return sorted(dates)
+            dates[(0, mm, dd)] = f"{dd:02d}/{mm:02d}"
+        if len(dates) >= MAX_DATES:
+            break
+    return [dates[k] for k in sorted(dates)]
+
+# ========= Detección de compra / agotado =========
 
-def _gather_dates_anywhere(page):
+# Contenedor del contenido principal: el texto se lee de acá y no de todo el body
+# (header/footer/menús no aportan y innerText sobre menos nodos es más barato)
+TEXT_SCOPES = ["main", "[role='main']"]
+
+# Tope de texto que cruza a Python para el fallback de fechas
+BODY_TEXT_MAX = 200_000
+
+# Todo lo que el detector necesita leer del DOM, en un solo round trip
+_SCAN_JS = """(args) => {
+    // misma definición que is_visible() de Playwright: caja no vacía y sin visibility:hidden
+    const visible = (el) => {
+        const r = el.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    const anyVisible = (css) => {
+        if (!css) return false;
+        try { return Array.from(document.querySelectorAll(css)).some(visible); }
+        catch (e) { return false; }
+    };
+    const dateRe = new RegExp(args.dateRe);
+    let regionText = '';
+    for (const sel of args.regionSels) {
+        const el = document.querySelector(sel);
+        if (el && visible(el)) {
+            if (el.tagName === 'SELECT') {
+                // <select>: las fechas están en las opciones; se corta al llegar al
+                // tope de fechas (Python no usaría más que esas)
+                const labels = [];
+                let withDate = 0;
+                for (const o of el.options) {
+                    const t = o.label || o.text || '';
+                    labels.push(t);
+                    if (dateRe.test(t) && ++withDate >= args.maxDates) break;
+                }
+                regionText = labels.join('\\n');
+            } else {
+                regionText = el.innerText || '';
+            }
+            break;
+        }
+    }
+    // sin fechas a la vista y con un selector de funciones visible: primero hay que abrirlo
+    if (args.triggers && !dateRe.test(regionText)) {
+        // un solo recorrido con el selector unido; en orden de documento, el primer
+        // elemento que matchea cada trigger es el mismo que daría querySelector
+        const first = new Array(args.triggers.length).fill(null);
+        try {
+            for (const el of document.querySelectorAll(args.triggersJoined)) {
+                args.triggers.forEach((s, i) => { if (!first[i] && el.matches(s)) first[i] = el; });
+            }
+        } catch (e) {}
+        const hit = first.findIndex(el => !!el && visible(el));
+        if (hit >= 0) return { trigger: hit };
+    }
+    const buyRe = new RegExp(args.buyRe, 'i');
+    let hasBuy = anyVisible(args.buyCss);
+    if (!hasBuy) {
+        // textContent no fuerza layout: filtra barato y solo los candidatos pagan innerText
+        const buyLoose = new RegExp(args.buyLoose, 'i');
+        // se recorre toda la NodeList en el lugar (sin copiarla a un array)
+        const nodes = document.querySelectorAll('button, a');
+        for (let i = 0; i < nodes.length && !hasBuy; i++) {
+            const el = nodes[i];
+            if (!buyLoose.test(el.textContent || '')) continue;
+            const t = (el.innerText || '').trim();
+            hasBuy = !!t && buyRe.test(t) && visible(el);
+        }
+    }
+    let body = '';
+    for (const sel of args.textScopes) {
+        const el = document.querySelector(sel);
+        body = el ? (el.innerText || '') : '';
+        if (body.trim()) break;
+    }
+    const fullBody = () => document.body ? (document.body.innerText || '') : '';
+    const scoped = !!body.trim();
+    if (!scoped) body = fullBody();
+    // el filtro de ruido mira todo el body (pie, formularios): solo se lee si hubo keyword
+    const soldText = new RegExp(args.soldRe, 'i').test(body)
+        && !new RegExp(args.noiseRe, 'i').test(scoped ? fullBody() : body);
+    // el body solo viaja a Python si hace falta el fallback global de fechas
+    const needBody = args.bodyFallback && !dateRe.test(regionText);
+    return {
+        title: document.title || '',
+        bodyText: needBody ? body.slice(0, args.bodyMax) : '',
+        regionText: regionText,
+        hasBuy: hasBuy,
+        hasSoldBadge: anyVisible(args.soldCss),
+        soldText: soldText,
+    };
+}"""
+
+async def _scan_page(page, profile: dict, open_dropdown: bool = True) -> dict:
     """
-    Fallback: busca fechas DD/MM(/AAAA) en todo el body, con filtro anti-retiro.
+    Lee título, texto de la región de funciones y flags de compra/agotado con un
+    único page.evaluate. Los tests de keywords corren en el navegador; el body
+    completo solo se devuelve si va a hacer falta buscar fechas en él. Si el
+    escaneo encuentra el dropdown de funciones cerrado, se abre y se relee.
     """
+    # todo menos los triggers sale del perfil: se arma una vez y queda guardado
+    base = profile.get("_scan_args")
+    if base is None:
+        base = profile["_scan_args"] = {
+            "regionSels": FUNC_REGIONS,
+            "textScopes": TEXT_SCOPES,
+            "buyCss": profile.get("buy_css", ""),
+            "soldCss": profile.get("soldout_css", ""),
+            "buyRe": profile["_buy_re"].pattern,
+            # textContent pierde los saltos de <br>: el prefiltro acepta palabras pegadas
+            "buyLoose": profile["_buy_re"].pattern.replace(r"\s+", r"\s*"),
+            "soldRe": profile["_soldout_re"].pattern,
+            "noiseRe": _RE_NOISE.pattern,
+            "dateRe": _RE_DATE_FULL.pattern,
+            "maxDates": MAX_DATES,
+            "bodyFallback": not profile.get("disable_global_date_fallback", False),
+            "bodyMax": BODY_TEXT_MAX,
+            "triggersJoined": FUNC_TRIGGERS_JOINED,
+        }
+    args = {**base, "triggers": FUNC_TRIGGERS if open_dropdown else None}
     try:
-        body_text = (page.evaluate("() => document.body.innerText") or "")
+        scan = await page.evaluate(_SCAN_JS, args) or {}
     except Exception:
-        body_text = ""
-    return _dates_from_text_filtered(body_text)
-
-# ========= Detección de compra / agotado =========
-
-def _text_contains_any(text: str, keywords: list[str]) -> bool:
-    t = (text or "").lower()
-    return any(k.lower() in t for k in keywords)
-
-def _detect_buy(page, profile: dict) -> bool:
-    # 1) por selectores
-    for sel in profile.get("buy_selectors", []):
-        try:
-            el = page.locator(sel).first
-            if el and el.count() > 0 and el.is_visible():
-                return True
-        except Exception:
-            continue
-    # 2) por texto en botones/enlaces
+        return {}
+    if "trigger" in scan:
+        await _open_dropdown(page, scan["trigger"])
+        return await _scan_page(page, profile, open_dropdown=False)
+    return scan
+
+async def _any_visible(page, selectors: list[str]) -> bool:
+    # los selectores ya traen ">> visible=true" (armados una vez por perfil);
+    # unidos con or_() van en un solo count() en vez de uno por grupo
+    if not selectors:
+        return False
     try:
-        btns = page.query_selector_all("button, a")
-        for b in btns[:500]:
-            try:
-                t = (b.inner_text() or "").strip().lower()
-            except Exception:
-                t = ""
-            if t and _text_contains_any(t, profile.get("buy_keywords", [])):
-                if b.is_visible():
-                    return True
+        loc = functools.reduce(lambda a, s: a.or_(page.locator(s)), selectors[1:], page.locator(selectors[0]))
+        return await loc.count() > 0
     except Exception:
-        pass
-    return False
+        return False
 
-def _detect_soldout(page, profile: dict) -> bool:
+async def _detect_buy(page, profile: dict, scan: dict) -> bool:
+    # 1) CSS nativo + texto en botones/enlaces (ya resuelto en el escaneo)
+    if scan.get("hasBuy"):
+        return True
+    # 2) selectores propios de Playwright
+    return await _any_visible(page, profile.get("buy_engine", []))
+
+async def _detect_soldout(page, profile: dict, scan: dict) -> bool:
     # 1) selectores directos
-    for sel in profile.get("soldout_selectors", []):
-        try:
-            loc = page.locator(sel).first
-            if loc and loc.count() > 0 and loc.is_visible():
-                return True
-        except Exception:
-            continue
-    # 2) texto global
+    if scan.get("hasSoldBadge") or await _any_visible(page, profile.get("soldout_engine", [])):
+        return True
+    # 2) texto global (keywords y filtro de ruido ya evaluados en el escaneo)
+    return bool(scan.get("soldText"))
+
+# ========= Pre-chequeo HTTP (sin navegador) =========
+
+_HTTP = requests.Session()
+_HTTP.headers.update({
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/128.0 Safari/537.36",
+})
+
+# Los GETs son pura espera de red: un pool propio para que salgan todos juntos
+# (sin competir con el executor por defecto) y conexiones keep-alive para cada hilo
+_HTTP_WORKERS = min(16, max(1, len(URLS)))
+_HTTP_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=_HTTP_WORKERS, thread_name_prefix="http")
+_HTTP.mount("https://", HTTPAdapter(pool_maxsize=_HTTP_WORKERS))
+
+# HTML más grande que esto no se baja: que decida Playwright
+_STATIC_MAX_BYTES = 2_000_000
+
+# Por URL: ETag / Last-Modified del último HTML servido (solo páginas sin
+# hidratación) y el último resultado decidido con ese HTML, o sea un SOLDOUT
+# estático: (monotonic, (fechas, title, hint)). Pasado UNCHANGED_MAX_AGE el GET
+# va sin validadores aunque el HTML no haya cambiado
+_VALIDATORS: dict[str, dict] = {}
+_LAST_RESULT: dict[str, tuple] = {}
+UNCHANGED_MAX_AGE = 1800
+
+
+def _static_check(url: str, prof: dict, validators: dict | None = None):
+    """
+    GET plano de la URL. Devuelve (title, 'SOLDOUT') si el agotado ya viene
+    renderizado del servidor; si no, (title, 'UNKNOWN') y decide Playwright.
+    Con `validators` el GET es condicional (304 → (title, 'UNCHANGED')) y el
+    dict queda con los validadores de la respuesta nueva.
+    """
+    if not prof.get("static_precheck", False):
+        return None, "UNKNOWN"
     try:
-        body_text = (page.evaluate("() => document.body.innerText") or "").lower()
+        # stream: primero headers; el cuerpo solo se lee si el tamaño declarado es razonable
+        with _HTTP.get(url, timeout=10, stream=True, headers=dict(validators or {})) as resp:
+            if resp.status_code == 304 and validators:
+                return _cached_title(url), "UNCHANGED"
+            if validators is not None:
+                validators.clear()
+            size = resp.headers.get("Content-Length", "")
+            if not resp.ok or (size.isdigit() and int(size) > _STATIC_MAX_BYTES):
+                return None, "UNKNOWN"
+            # sin Content-Length (chunked) el tope se controla mientras se lee
+            chunks, total = [], 0
+            for chunk in resp.iter_content(64 * 1024):
+                total += len(chunk)
+                if total > _STATIC_MAX_BYTES:
+                    return None, "UNKNOWN"
+                chunks.append(chunk)
+            body = b"".join(chunks).decode(resp.encoding or "utf-8", errors="replace")
     except Exception:
-        body_text = ""
-    if _text_contains_any(body_text, profile.get("soldout_keywords", [])):
-        # Evitar falsos positivos muy obvios
-        noise = ["+54", "número de dni", "masculino", "femenino", "argentina", "brasil"]
-        if not _text_contains_any(body_text, noise):
-            return True
-    return False
+        return None, "UNKNOWN"
+    m = _RE_HTML_TITLE.search(body)
+    title = _clean_title(html.unescape(m.group(1))) if m else None
+    if _RE_HYDRATION.search(body):
+        return title, "UNKNOWN"
+    if validators is not None:
+        for hdr, cond in (("ETag", "If-None-Match"), ("Last-Modified", "If-Modified-Since")):
+            if resp.headers.get(hdr):
+                validators[cond] = resp.headers[hdr]
+    # sin keyword en el HTML crudo no hay nada que confirmar: ni se limpia
+    if not prof["_soldout_re"].search(body):
+        return title, "UNKNOWN"
+    # solo texto del documento (sin tags, atributos, URLs, meta ni bundles JS,
+    # que traen "agotado"/"tickets" en sus strings). Mismas reglas que check_url:
+    # con texto de compra (agotado parcial) o ruido del formulario/pie no se
+    # decide acá, que lo vea Chromium
+    text = html.unescape(_RE_TAG.sub(" ", _RE_NON_TEXT.sub(" ", body)))
+    if (prof["_soldout_re"].search(text) and not _RE_NOISE.search(text)
+            and not prof["_buy_re"].search(text)):
+        return title, "SOLDOUT"
+    return title, "UNKNOWN"
 
 # ========= Núcleo: check_url =========
 
-def check_url(url: str, page):
+def _ready_selectors(profile: dict) -> str:
+    # el perfil no cambia en runtime: se arma la primera vez y queda guardado
+    css = profile.get("_ready_css")
+    if css is None:
+        css = profile["_ready_css"] = ", ".join(dict.fromkeys(
+            FUNC_TRIGGERS
+            + FUNC_REGIONS
+            + _css_only(profile.get("buy_selectors", []))
+            + _css_only(profile.get("soldout_selectors", []))
+        ))
+    return css
+
+# Por URL: tras READY_MISSES_SHORT chequeos seguidos sin ningún selector "listo"
+# se espera poco; cada READY_FULL_EVERY chequeos igual se espera el tope completo
+# para que la URL pueda volver a la espera normal si el contenido aparece tarde
+READY_TIMEOUT = 3000
+READY_TIMEOUT_SHORT = 300
+READY_MISSES_SHORT = 3
+READY_FULL_EVERY = 5
+_READY_MISSES: dict[str, int] = {}
+_READY_CHECKS: dict[str, int] = {}
+
+# Por host: duración típica del goto (promedio móvil, ms). En hosts que cargan
+# rápido el primer intento corta antes; si se pasa del tope (el sitio se puso
+# lento, p. ej. en plena salida a la venta) se reintenta una vez con el timeout
+# completo dentro del mismo chequeo y el host vuelve a empezar el promedio
+GOTO_TIMEOUT_MAX = 60000
+GOTO_TIMEOUT_MIN = 15000
+_GOTO_MS: dict[str, float] = {}
+
+def _goto_timeout(host: str) -> float:
+    avg = _GOTO_MS.get(host)
+    if avg is None:
+        return GOTO_TIMEOUT_MAX
+    return min(GOTO_TIMEOUT_MAX, max(GOTO_TIMEOUT_MIN, 4 * avg))
+
+async def _goto(page, url: str):
+    """goto hasta domcontentloaded con el timeout adaptativo del host (ver _GOTO_MS)."""
+    host = _host(url)
+    timeout = _goto_timeout(host)
+    t0 = time.monotonic()
+    try:
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+    except PlaywrightTimeoutError:
+        _GOTO_MS.pop(host, None)
+        if timeout >= GOTO_TIMEOUT_MAX:
+            raise
+        t0 = time.monotonic()
+        await page.goto(url, wait_until="domcontentloaded", timeout=GOTO_TIMEOUT_MAX)
+    except Exception:
+        _GOTO_MS.pop(host, None)
+        raise
+    ms = (time.monotonic() - t0) * 1000
+    _GOTO_MS[host] = ms if host not in _GOTO_MS else 0.8 * _GOTO_MS[host] + 0.2 * ms
+
+async def _wait_for_any(page, selector: str, timeout: int) -> bool:
+    """True si aparece algún elemento de `selector` antes del timeout."""
+    try:
+        await page.wait_for_selector(selector, state="attached", timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+async def check_url(url: str, page):
     """
     Devuelve (fechas, title, hint):
       - fechas: lista 'dd/mm/aaaa' (o dd/mm) si se detectó por UI válida
@@ -277,44 +867,65 @@ def check_url(url: str, page):
     """
     fechas, title, hint = [], None, "UNKNOWN"
 
-    page.goto(url, timeout=60000)
-    page.wait_for_load_state("networkidle", timeout=15000)
-
-    # micro-scroll para destrabar contenido lazy
-    try:
-        page.evaluate("() => window.scrollTo(0, document.body.scrollHeight)")
-        page.wait_for_timeout(200)
-        page.evaluate("() => window.scrollTo(0, 0)")
-        page.wait_for_timeout(100)
-    except Exception:
-        pass
+    prof = _profile_for(url)
+
+    # goto vuelve en domcontentloaded (sin esperar el load de iframes/ads) y
+    # después se espera lo que realmente nos importa
+    # (networkidle casi nunca llega en sitios con ads/analytics)
+    await _goto(page, url)
+    misses = _READY_MISSES.get(url, 0)
+    n_checks = _READY_CHECKS[url] = _READY_CHECKS.get(url, 0) + 1
+    short = misses >= READY_MISSES_SHORT and n_checks % READY_FULL_EVERY != 0
+    ready_timeout = READY_TIMEOUT_SHORT if short else READY_TIMEOUT
+    content_ready = await _wait_for_any(page, _ready_selectors(prof), timeout=ready_timeout)
+    _READY_MISSES[url] = 0 if content_ready else misses + 1
+    if not content_ready:
+        # sin señal todavía: esperar a que termine de cargar (polling de 100 ms)
+        try:
+            await page.wait_for_function("document.readyState === 'complete'", polling=100, timeout=4000)
+        except Exception:
+            pass
 
-    title = extract_title(page) or prettify_from_slug(url)
-    prof = VENDOR_PROFILES.get(_host(url)) or VENDOR_PROFILES.get("www.allaccess.com.ar")
+    # micro-scroll para destrabar contenido lazy (solo si no apareció nada);
+    # en vez de dormir, esperamos a que aparezcan botones/enlaces nuevos
+    if not content_ready:
+        try:
+            n = await page.evaluate(
+                "() => { window.scrollTo(0, document.body.scrollHeight);"
+                " return document.querySelectorAll('button, a').length; }"
+            )
+            try:
+                await page.wait_for_function(
+                    "(n) => document.querySelectorAll('button, a').length > n", arg=n, timeout=1000
+                )
+            except Exception:
+                pass
+            await page.evaluate("() => window.scrollTo(0, 0)")
+        except Exception:
+            pass
 
     # 1) fechas (preferimos la región de funciones)
-    _open_dropdown_if_any(page)
-    region = _find_functions_region(page)
-    fechas = _gather_dates_in_region(region)
+    scan = await _scan_page(page, prof)
+    title = _clean_title(scan.get("title"))
+    _remember_title(url, title)
+    title = title or slug_title(url)
+    fechas = _gather_dates_in_region(scan.get("regionText"))
 
     # ⚠️ Para algunos vendors (Deportick) deshabilitamos el fallback global
     if not fechas and not prof.get("disable_global_date_fallback", False):
-        alt = _gather_dates_anywhere(page)
+        alt = _dates_from_text_filtered(scan.get("bodyText"))
         if alt:
             fechas = alt
 
-    # 2) flags de compra / agotado
-    buy = _detect_buy(page, prof)
-    sold = _detect_soldout(page, prof)
-
-    # 3) decisión — prioridad a SOLDOUT si no hay botón de compra
-    #    (evita falsos "disponible" por fechas de retiro/canje)
-    if sold and not buy:
+    # 2) decisión — prioridad a SOLDOUT si no hay botón de compra
+    #    (evita falsos "disponible" por fechas de retiro/canje).
+    #    Con botón de compra el agotado no cambia nada: ni se busca.
+    if await _detect_buy(page, prof, scan):
+        hint = "AVAILABLE_BY_DATES" if fechas else "AVAILABLE_BY_BUY"
+    elif await _detect_soldout(page, prof, scan):
         hint = "SOLDOUT"
     elif fechas:
         hint = "AVAILABLE_BY_DATES"
-    elif buy:
-        hint = "AVAILABLE_BY_BUY"
     else:
         hint = "UNKNOWN"
 
@@ -322,69 +933,180 @@ def check_url(url: str, page):
 
 # ========= Telegram =========
 
+_TITLE_FETCH = None  # Future del refresco de títulos en curso
+
+async def _fetch_titles(urls):
+    # vendors con HTML del servidor: el <title> sale del GET plano, sin abrir páginas
+    loop = asyncio.get_running_loop()
+    got = await asyncio.gather(*[
+        loop.run_in_executor(_HTTP_POOL, _static_check, url, _profile_for(url)) for url in urls
+    ])
+    rest = []
+    for url, (title, _) in zip(urls, got):
+        if title:
+            _remember_title(url, title)
+        else:
+            rest.append(url)
+    # el resto en paralelo, una página por URL (new_page acota a los slots del pool)
+    await asyncio.gather(*[_fetch_title_in_page(url) for url in rest])
+
+async def _fetch_title_in_page(url: str):
+    try:
+        async with new_page(_host(url)) as page:
+            await _goto(page, url)
+            _remember_title(url, await extract_title(page))
+    except Exception:
+        pass
+
 def list_shows() -> list[str]:
-    out = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        for i, url in enumerate(URLS, 1):
-            try:
-                page.goto(url, timeout=60000)
-                page.wait_for_load_state("domcontentloaded", timeout=10000)
-                t = extract_title(page) or prettify_from_slug(url)
-            except Exception:
-                t = prettify_from_slug(url)
-            out.append(f"{i}. {t}")
-        browser.close()
-    return out
+    # responde al instante con cache/slug; lo que falte (o venció) se busca en segundo plano
+    global _TITLE_FETCH
+    missing = [u for u in URLS if _cached_title(u) is None]
+    if missing and (_TITLE_FETCH is None or _TITLE_FETCH.done()):
+        _TITLE_FETCH = submit(_fetch_titles(missing))
+    return [f"{i}. {_cached_title(url) or slug_title(url)}" for i, url in enumerate(URLS, 1)]
 
 def status_for(idx: int | None = None) -> list[str]:
     results = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-
-        items = enumerate(URLS, 1)
-        if isinstance(idx, int):
-            items = [(idx, URLS[idx-1])]
+    # un índice: solo esa URL (sin armar la lista completa)
+    items = [(idx, _URL_BY_IDX[idx])] if isinstance(idx, int) else list(_URL_BY_IDX.items())
 
-        for i, url in items:
-            try:
-                fechas, title, hint = check_url(url, page)
-                if hint in ("AVAILABLE_BY_DATES", "AVAILABLE_BY_BUY"):
-                    fechas_txt = ", ".join(sorted(fechas)) if fechas else "(sin fecha)"
-                    msg = f"✅ **Disponible** — {title}\nFechas: {fechas_txt}\nÚltimo check: {now_local():%Y-%m-%d %H:%M:%S}{SIGN}"
-                elif hint == "SOLDOUT":
-                    msg = f"⛔ Agotado — {title}\nÚltimo check: {now_local():%Y-%m-%d %H:%M:%S}{SIGN}"
-                else:
-                    msg = f"❓ Indeterminado — {title}\nÚltimo check: {now_local():%Y-%m-%d %H:%M:%S}{SIGN}"
-            except Exception as e:
-                msg = f"💥 Error al chequear [{i}] {url}\n{e}{SIGN}"
-            results.append(msg)
-
-        browser.close()
+    jobs = check_many([u for _, u in items])
+    for (i, _), (url, fut) in zip(items, jobs):
+        try:
+            fechas, title, hint = fut.result()
+            # solo cambia la cabecera; el pie ("Último check" + firma) es común
+            if hint in ("AVAILABLE_BY_DATES", "AVAILABLE_BY_BUY"):
+                fechas_txt = ", ".join(fechas) if fechas else "(sin fecha)"
+                head = f"✅ **Disponible** — {title}\nFechas: {fechas_txt}"
+            elif hint == "SOLDOUT":
+                head = f"⛔ Agotado — {title}"
+            else:
+                head = f"❓ Indeterminado — {title}"
+            msg = f"{head}\nÚltimo check: {now_local():%Y-%m-%d %H:%M:%S}{SIGN}"
+        except Exception as e:
+            msg = f"💥 Error al chequear [{i}] {url}\n{e}{SIGN}"
+        results.append(msg)
     return results
 
+# ========= Comandos del bot =========
+
+def _cmd_shows(tlow: str):
+    names = list_shows()
+    if names:
+        tg_send("🎯 Monitoreando:\n" + "\n".join(names) + f"\n{SIGN}", force=True)
+    else:
+        tg_send("No hay URLs configuradas." + SIGN, force=True)
+
+def _cmd_status(tlow: str):
+    m = _RE_CMD_STATUS.match(tlow)
+    if m:
+        idx = int(m.group(1))
+        if idx in _URL_BY_IDX:
+            for s in status_for(idx):
+                tg_send(s, force=True)
+        else:
+            tg_send(_MSG_OUT_OF_RANGE, force=True)
+    else:
+        for s in status_for(None):
+            tg_send(s, force=True)
+
+def _cmd_debug(tlow: str):
+    m = _RE_CMD_DEBUG.match(tlow)
+    if not m:
+        tg_send(f"Usá: /debug N (ej: /debug 2){SIGN}", force=True)
+        return
+    idx = int(m.group(1))
+    url = _URL_BY_IDX.get(idx)
+    if url is None:
+        tg_send(_MSG_OUT_OF_RANGE, force=True)
+        return
+    try:
+        fechas, title, hint = run_in_browser(_check_in_page(url, static=False))
+        tg_send(
+            "🧪 DEBUG — {title}\n"
+            "URL idx {idx}\n"
+            "decision_hint={hint}\n"
+            "fechas: {fechas}\n"
+            "{sign}".format(
+                title=title, idx=idx, hint=hint,
+                fechas=", ".join(fechas) if fechas else "-",
+                sign=SIGN
+            ),
+            force=True
+        )
+    except Exception as e:
+        tg_send(f"💥 Error debug: {e}{SIGN}", force=True)
+
+def _cmd_sectores(tlow: str):
+    m = _RE_CMD_SECTORES.match(tlow)
+    if not m:
+        tg_send(f"Usá: /sectores N (ej: /sectores 2){SIGN}", force=True)
+        return
+    idx = int(m.group(1))
+    # solo hace falta el nombre: cache o slug, sin armar la lista ni refrescar títulos
+    url = _URL_BY_IDX.get(idx)
+    if url is not None:
+        name = _cached_title(url) or slug_title(url)
+    else:
+        name = f"#{idx}"
+    tg_send(f"🧭 {name} — Sectores disponibles:\n(sin sectores)\n{SIGN}", force=True)
+
+def _cmd_last(tlow: str):
+    ts = LAST_LOOP_AT
+    if ts is None:
+        tg_send(f"Aún no hay un ciclo registrado. Esperá el primer loop…{SIGN}", force=True)
+    else:
+        tg_send(f"⏱️ Último ciclo: {ts:%Y-%m-%d %H:%M:%S} ({TZ_NAME}){SIGN}", force=True)
+
+def _cmd_refresh(tlow: str):
+    if not _MONITOR_RUNNING:
+        # sin loop de monitoreo: chequeo directo, igual que /status
+        for s in status_for(None):
+            tg_send(s, force=True)
+        return
+    if _REFRESH.is_set():
+        tg_send(f"🔄 Ya hay un chequeo pedido, sale en breve.{SIGN}", force=True)
+        return
+    _REFRESH.set()
+    tg_send(f"🔄 Chequeando todas las URLs ahora…{SIGN}", force=True)
+
+# comando (primer token, sin @bot) → handler(texto en minúsculas)
+COMMANDS = {
+    "/shows": _cmd_shows,
+    "/status": _cmd_status,
+    "/debug": _cmd_debug,
+    "/sectores": _cmd_sectores,
+    "/last": _cmd_last,
+    "/ping": _cmd_last,
+    "/refresh": _cmd_refresh,
+}
+
 def telegram_polling():
-    global LAST_LOOP_AT
     last_update_id = None
     base = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
     def get_updates(offset=None):
+        # long-poll: Telegram retiene la respuesta hasta 55 s si no hay novedades;
+        # conectar es rápido, la lectura tiene que aguantar el long-poll completo
+        params = {"timeout": 55, "allowed_updates": json.dumps(["message"])}
+        if offset is not None:
+            params["offset"] = offset
+        return _TG_SESSION.get(f"{base}/getUpdates", params=params, timeout=(5, 60)).json()
+
+    backoff = 1
+    while True:
         try:
-            params = {"timeout": 25}
-            if offset is not None:
-                params["offset"] = offset
-            return requests.get(f"{base}/getUpdates", params=params, timeout=30).json()
+            data = get_updates(last_update_id + 1 if last_update_id else None)
+            ok = data.get("ok", False) if isinstance(data, dict) else False
         except Exception:
-            return {}
-
-    while True:
-        data = get_updates(last_update_id + 1 if last_update_id else None)
-        ok = data.get("ok", False) if isinstance(data, dict) else False
+            ok = False
         if not ok:
-            time.sleep(1)
+            # error de red o de la API (409, token inválido…): esperar cada vez más (tope 30 s)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
             continue
+        backoff = 1
 
         for upd in data.get("result", []):
             last_update_id = upd["update_id"]
@@ -396,144 +1118,144 @@ def telegram_polling():
                 continue
             tlow = text.lower()
 
-            if tlow.startswith("/shows"):
-                names = list_shows()
-                if names:
-                    tg_send("🎯 Monitoreando:\n" + "\n".join(names) + f"\n{SIGN}", force=True)
-                else:
-                    tg_send("No hay URLs configuradas." + SIGN, force=True)
-
-            elif tlow.startswith("/status"):
-                m = re.match(r"^/status\s+(\d+)\s*$", tlow)
-                if m:
-                    idx = int(m.group(1))
-                    if 1 <= idx <= len(URLS):
-                        for s in status_for(idx):
-                            tg_send(s, force=True)
-                    else:
-                        tg_send(f"Índice fuera de rango (1–{len(URLS)}).{SIGN}", force=True)
-                else:
-                    for s in status_for(None):
-                        tg_send(s, force=True)
-
-            elif tlow.startswith("/debug"):
-                m = re.match(r"^/debug\s+(\d+)\s*$", tlow)
-                if not m:
-                    tg_send(f"Usá: /debug N (ej: /debug 2){SIGN}", force=True)
-                    continue
-                idx = int(m.group(1))
-                if not (1 <= idx <= len(URLS)):
-                    tg_send(f"Índice fuera de rango (1–{len(URLS)}).{SIGN}", force=True)
-                    continue
-                url = URLS[idx-1]
-                with sync_playwright() as p:
-                    browser = p.chromium.launch(headless=True)
-                    page = browser.new_page()
-                    try:
-                        fechas, title, hint = check_url(url, page)
-                        tg_send(
-                            "🧪 DEBUG — {title}\n"
-                            "URL idx {idx}\n"
-                            "decision_hint={hint}\n"
-                            "fechas: {fechas}\n"
-                            "{sign}".format(
-                                title=title, idx=idx, hint=hint,
-                                fechas=", ".join(fechas) if fechas else "-",
-                                sign=SIGN
-                            ),
-                            force=True
-                        )
-                    except Exception as e:
-                        tg_send(f"💥 Error debug: {e}{SIGN}", force=True)
-                    finally:
-                        browser.close()
-
-            elif tlow.startswith("/sectores"):
-                m = re.match(r"^/sectores\s+(\d+)\s*$", tlow)
-                if not m:
-                    tg_send(f"Usá: /sectores N (ej: /sectores 2){SIGN}", force=True)
-                    continue
-                idx = int(m.group(1))
-                names = list_shows()
-                name = names[idx-1].split(". ", 1)[-1] if 1 <= idx <= len(URLS) else f"#{idx}"
-                tg_send(f"🧭 {name} — Sectores disponibles:\n(sin sectores)\n{SIGN}", force=True)
-
-            elif tlow.startswith("/last") or tlow.startswith("/ping"):
-                ts = LAST_LOOP_AT
-                if ts is None:
-                    tg_send(f"Aún no hay un ciclo registrado. Esperá el primer loop…{SIGN}", force=True)
-                else:
-                    tg_send(f"⏱️ Último ciclo: {ts:%Y-%m-%d %H:%M:%S} ({TZ_NAME}){SIGN}", force=True)
-
-        time.sleep(0.4)
+            handler = COMMANDS.get(tlow.split(maxsplit=1)[0].split("@", 1)[0])
+            if handler:
+                handler(tlow)
 
 # ========= Loop de monitoreo =========
 
-def monitor_loop():
-    global LAST_LOOP_AT
-    last_snapshot = {}  # url -> 'SOLDOUT'|'AVAILABLE'|'UNKNOWN'
-    while True:
-        try:
-            print(f"[loop] start {now_local():%Y-%m-%d %H:%M:%S} urls={len(URLS)}", flush=True)
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-
-                available_summary = []
-
-                for url in URLS:
-                    try:
-                        fechas, title, hint = check_url(url, page)
-                        state = "SOLDOUT" if hint == "SOLDOUT" else ("AVAILABLE" if hint.startswith("AVAILABLE") else "UNKNOWN")
-                        prev = last_snapshot.get(url)
-
-                        # Log por URL (para ver que pasó por acá)
-                        fechas_txt = ", ".join(fechas) if fechas else "(sin fecha)"
-                        print(f"[loop-check] {title} → {state} ({fechas_txt})", flush=True)
-
-                        # Notificación de transición a DISPONIBLE
-                        if prev in (None, "SOLDOUT", "UNKNOWN") and state == "AVAILABLE":
-                            tg_send(f"✅ ¡Entradas disponibles!\n{title}\nFechas: {fechas_txt}\n{SIGN}", force=True)
-
-                        # Notificación de transición a AGOTADO (suave)
-                        if prev == "AVAILABLE" and state == "SOLDOUT":
-                            tg_send(f"⛔ Se agotó — {title}{SIGN}", force=False)
-
-                        if state == "AVAILABLE":
-                            available_summary.append(f"- {title} — {fechas_txt}")
+def _load_snapshot():
+    """Devuelve (ts, {url: estado}) del último ciclo guardado, o (0, {})."""
+    try:
+        with open(SNAPSHOT_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+        states = {u: st for u, st in (data.get("states") or {}).items() if u in URLS}
+        return float(data.get("ts", 0)), states
+    except Exception:
+        return 0.0, {}
 
-                        last_snapshot[url] = state
+def _save_snapshot(states: dict):
+    # escritura atómica: nunca queda un JSON a medias si el proceso muere
+    tmp = SNAPSHOT_PATH + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "states": states}, f)
+        os.replace(tmp, SNAPSHOT_PATH)
+    except Exception as e:
+        log.warning(f"⚠️ No se pudo guardar snapshot: {e}")
 
-                    except Exception as e:
-                        print(f"⚠️ Error check {url}: {e}", flush=True)
-                        traceback.print_exc()
+# URLs agotadas hace rato se chequean cada vez menos (se resetea al cambiar de estado)
+SOLDOUT_BACKOFF_AFTER = 3      # chequeos SOLDOUT seguidos antes de espaciar
+SOLDOUT_BACKOFF_MAX   = 3600   # tope del intervalo por URL (s)
 
-                # Resumen opcional por ciclo
-                if NOTIFY_AVAILABLE_EVERY_LOOP and available_summary:
-                    tg_send(
-                        "✅ Disponibles ahora (" + str(len(available_summary)) + "):\n"
-                        + "\n".join(available_summary)
-                        + f"\nÚltimo check: {now_local():%Y-%m-%d %H:%M:%S}{SIGN}",
-                        force=True
-                    )
+def _schedule_next(backoff: dict, url: str, state: str, prev: str | None):
+    """Actualiza racha y próximo chequeo de `url` según el estado recién observado."""
+    st = backoff.setdefault(url, {"streak": 0, "next_at": 0.0})
+    if state != "SOLDOUT":
+        st["streak"], st["next_at"] = 0, 0.0
+        return
+    st["streak"] = st["streak"] + 1 if prev == "SOLDOUT" else 1
+    steps = st["streak"] - SOLDOUT_BACKOFF_AFTER + 1
+    if steps > 0:
+        delay = min(SOLDOUT_BACKOFF_MAX, max(30, CHECK_EVERY) * 2 ** min(steps, 4))
+        st["next_at"] = time.monotonic() + delay
 
-                browser.close()
+def monitor_loop():
+    global LAST_LOOP_AT, _MONITOR_RUNNING
+    _MONITOR_RUNNING = True
+    ts, last_snapshot = _load_snapshot()  # url -> 'SOLDOUT'|'AVAILABLE'|'UNKNOWN'
+    backoff = {}  # url -> {"streak": int, "next_at": monotonic}
+    unchanged_cycles = 0  # ciclos seguidos sin ninguna transición de estado
+    cycles = 0
+    age = time.time() - ts
+    if last_snapshot and age < CHECK_EVERY // 2:
+        # reinicio reciente: el estado guardado sigue fresco, esperamos al próximo turno
+        wait = max(30, CHECK_EVERY) - age
+        log.info(f"[loop] snapshot de hace {age:.0f}s, primer ciclo en {wait:.0f}s")
+        _REFRESH.wait(wait)
+    while True:
+        try:
+            # un /refresh chequea todo, incluso las URLs espaciadas por estar agotadas
+            forced = _REFRESH.is_set()
+            _REFRESH.clear()
+            now_mono = time.monotonic()
+            due = [u for u in URLS if forced or backoff.get(u, {}).get("next_at", 0.0) <= now_mono]
+            log.info(f"[loop] start {now_local():%Y-%m-%d %H:%M:%S} urls={len(URLS)} due={len(due)}")
+            available_summary = []
+            changed = False
+
+            # se procesan a medida que terminan: una URL lenta no demora los avisos del resto
+            jobs = {fut: url for url, fut in check_many(due)}
+            for fut in concurrent.futures.as_completed(jobs):
+                url = jobs[fut]
+                try:
+                    fechas, title, hint = fut.result()
+                    state = "SOLDOUT" if hint == "SOLDOUT" else ("AVAILABLE" if hint.startswith("AVAILABLE") else "UNKNOWN")
+                    prev = last_snapshot.get(url)
+
+                    # Log por URL (para ver que pasó por acá)
+                    fechas_txt = ", ".join(fechas) if fechas else "(sin fecha)"
+                    log.info(f"[loop-check] {title} → {state} ({fechas_txt})")
+
+                    # Notificación de transición a DISPONIBLE
+                    if prev in (None, "SOLDOUT", "UNKNOWN") and state == "AVAILABLE":
+                        tg_send(f"✅ ¡Entradas disponibles!\n{title}\nFechas: {fechas_txt}\n{SIGN}", force=True)
+
+                    # Notificación de transición a AGOTADO (suave)
+                    if prev == "AVAILABLE" and state == "SOLDOUT":
+                        tg_send(f"⛔ Se agotó — {title}{SIGN}", force=False)
+
+                    if state == "AVAILABLE":
+                        available_summary.append(f"- {title} — {fechas_txt}")
+
+                    changed = changed or state != prev
+                    last_snapshot[url] = state
+                    _schedule_next(backoff, url, state, prev)
+
+                except Exception as e:
+                    log.exception(f"⚠️ Error check {url}: {e}")
+
+            # Resumen opcional por ciclo
+            if NOTIFY_AVAILABLE_EVERY_LOOP and available_summary:
+                tg_send(
+                    "✅ Disponibles ahora (" + str(len(available_summary)) + "):\n"
+                    + "\n".join(available_summary)
+                    + f"\nÚltimo check: {now_local():%Y-%m-%d %H:%M:%S}{SIGN}",
+                    force=True
+                )
+
+            _save_snapshot(last_snapshot)
+            unchanged_cycles = 0 if changed else unchanged_cycles + 1
+
+            cycles += 1
+            if cycles % CTX_RECYCLE_EVERY == 0:
+                run_in_browser(_recycle_context())
 
         except Exception as e:
-            print(f"💥 Loop error: {e}", flush=True)
-        finally:
-            LAST_LOOP_AT = now_local()
-            print(f"[loop] done  {LAST_LOOP_AT:%Y-%m-%d %H:%M:%S} — sleeping {CHECK_EVERY}s", flush=True)
-            time.sleep(max(30, CHECK_EVERY))
+            log.error(f"💥 Loop error: {e}")
+
+        # fuera de un finally: un SystemExit (SIGTERM) sale ya, sin esperar la pausa
+        LAST_LOOP_AT = now_local()
+        # sin cambios, el intervalo se estira de a 25 % hasta 4×; cualquier transición lo resetea
+        base = max(30, CHECK_EVERY)
+        pause = min(base * (1 + unchanged_cycles * 0.25), base * 4)
+        log.info(f"[loop] done  {LAST_LOOP_AT:%Y-%m-%d %H:%M:%S} — sleeping {pause:.0f}s")
+        _REFRESH.wait(pause)
 
 # ========= Arranque =========
 
 if __name__ == "__main__":
+    # Railway frena el contenedor con SIGTERM: salir "prolijo" para que corra atexit
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
     mode = _get_env_any("MODE", "both").lower()   # both | bot | monitor
-    print(f"[RadarEntradas] mode={mode} urls={len(URLS)} tz={TZ_NAME} quiet={QUIET_START}-{QUIET_END}", flush=True)
+    log.info(f"[RadarEntradas] mode={mode} urls={len(URLS)} tz={TZ_NAME} quiet={QUIET_START}-{QUIET_END}")
+
+    # driver + Chromium + páginas del pool arrancan ya, en paralelo al resto del
+    # arranque: el primer ciclo (o el primer /status) no paga el lanzamiento
+    submit(_warm_up())
 
     if mode in ("bot", "both"):
-        import threading
         th = threading.Thread(target=telegram_polling, daemon=True)
         th.start()
 